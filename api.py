@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 import aiohttp
+import asyncio
 import json
-import re
+import time
+from collections import OrderedDict
 from logger import setup_logger
 from config import (
     MAX_RADIUS_KM, MAX_INFO_LIMIT, 
-    PLACES_API_BASE_URL, PLACES_API_HEADERS
+    PLACES_API_BASE_URL, PLACES_API_HEADERS, PLACES_API_TIMEOUT,
+    PLACES_API_POOL_LIMIT, PLACES_API_POOL_LIMIT_PER_HOST,
+    PLACES_API_DNS_CACHE_TTL, PLACES_API_KEEPALIVE_TIMEOUT,
+    PLACES_CACHE_TTL, PLACES_CACHE_MAX_ENTRIES, PLACES_CACHE_PRECISION,
+    PLACES_API_MAX_CONCURRENT
 )
-from utils import parse_location
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 try:
     from api_key import API_KEY
@@ -16,39 +26,97 @@ except ImportError:
     logger.error("API key file not found! Please create api_key.py with your Google Places API key.")
     API_KEY = "YOUR_API_KEY_GOES_HERE"
 
-async def get_nearby_places(latitude, longitude, radius_km, limit):
+_logger = setup_logger('places_api')
+
+_PLACES_HEADERS = {**PLACES_API_HEADERS, "X-Goog-Api-Key": API_KEY}
+
+# searchNearby body with latitude, longitude, radius (m) and maxResultCount
+# slots; formatted floats and ints are already valid JSON literals.
+_REQUEST_BODY_TEMPLATE = (
+    '{{"locationRestriction":{{"circle":{{"center":'
+    '{{"latitude":{},"longitude":{}}},"radius":{}}}}},"maxResultCount":{}}}'
+)
+
+def create_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=PLACES_API_POOL_LIMIT,
+            limit_per_host=PLACES_API_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=PLACES_API_DNS_CACHE_TTL,
+            keepalive_timeout=PLACES_API_KEEPALIVE_TIMEOUT
+        ),
+        headers=_PLACES_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=PLACES_API_TIMEOUT)
+    )
+
+_api_semaphore = asyncio.Semaphore(PLACES_API_MAX_CONCURRENT)
+
+# (lat, lon, radius_m, limit) -> (monotonic time stored, formatted JSON string),
+# least recently used first
+_places_cache = OrderedDict()
+
+# (lat, lon, radius_m, limit) -> task fetching that key from the API
+_inflight_requests = {}
+
+def _cache_get(key):
+    entry = _places_cache.get(key)
+    if entry is None:
+        return None
+    
+    stored_at, json_str = entry
+    if time.monotonic() - stored_at >= PLACES_CACHE_TTL:
+        del _places_cache[key]
+        return None
+    
+    _places_cache.move_to_end(key)
+    return json_str
+
+def _cache_put(key, json_str):
+    _places_cache[key] = (time.monotonic(), json_str)
+    _places_cache.move_to_end(key)
+    
+    while len(_places_cache) > PLACES_CACHE_MAX_ENTRIES:
+        _places_cache.popitem(last=False)
+
+async def get_nearby_places(session, latitude, longitude, radius_km, limit):
     radius_m = min(radius_km, MAX_RADIUS_KM) * 1000
     
     limit = min(limit, MAX_INFO_LIMIT)
     
-    logger = setup_logger('places_api')
-    logger.debug(f"Requesting places data with radius={radius_km}km, limit={limit}")
+    _logger.debug("Requesting places data with radius=%skm, limit=%s", radius_km, limit)
     
-    request_body = {
-        "locationRestriction": {
-            "circle": {
-                "center": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                },
-                "radius": radius_m
-            }
-        },
-        "maxResultCount": limit
-    }
+    cache_key = (
+        round(latitude, PLACES_CACHE_PRECISION),
+        round(longitude, PLACES_CACHE_PRECISION),
+        radius_m,
+        limit
+    )
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        _logger.debug("Places cache hit for %s", cache_key)
+        return cached
     
+    # Identical concurrent WHATSATs share one API call. shield() keeps a
+    # cancelled caller from cancelling the fetch the others are waiting on.
+    fetch = _inflight_requests.get(cache_key)
+    if fetch is None:
+        request_body = _REQUEST_BODY_TEMPLATE.format(
+            latitude, longitude, radius_m, limit).encode()
+        fetch = asyncio.create_task(_fetch_places(session, cache_key, request_body))
+        _inflight_requests[cache_key] = fetch
+        fetch.add_done_callback(lambda _: _inflight_requests.pop(cache_key, None))
+    
+    return await asyncio.shield(fetch)
+
+async def _fetch_places(session, cache_key, request_body):
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = PLACES_API_HEADERS.copy()
-            headers["X-Goog-Api-Key"] = API_KEY
-            
+        async with _api_semaphore:
             async with session.post(
                 PLACES_API_BASE_URL,
-                json=request_body,
-                headers=headers
+                data=request_body
             ) as response:
                 if response.status != 200:
-                    logger.error(f"API request failed with status {response.status}")
+                    _logger.error("API request failed with status %s", response.status)
                     error_text = await response.text()
                     return json.dumps({
                         "error": "Failed to retrieve data from Google Places API", 
@@ -56,13 +124,17 @@ async def get_nearby_places(latitude, longitude, radius_km, limit):
                         "details": error_text
                     })
                 
-                data = await response.json()
+                if orjson is not None:
+                    data = orjson.loads(await response.read())
+                else:
+                    data = json.loads(await response.text())
                 
+                # json.dumps escapes newlines inside strings and adds no trailing
+                # newline, so the indented output never contains blank lines.
                 json_str = json.dumps(data, indent=3)
-                json_str = re.sub(r'\n{2,}', '\n', json_str)
-                json_str = json_str.rstrip('\n')
+                _cache_put(cache_key, json_str)
                 return json_str
     
     except Exception as e:
-        logger.error(f"Error accessing Google Places API: {str(e)}")
+        _logger.error("Error accessing Google Places API: %s", e)
         return json.dumps({"error": f"Error accessing Google Places API: {str(e)}"})
\ No newline at end of file
@@ -30,6 +30,12 @@ HOST = '127.0.0.1'
 CONNECTION_RETRY_INITIAL = 1
 CONNECTION_RETRY_MAX = 60
 CONNECTION_RETRY_FACTOR = 2
+STREAM_LIMIT = 65536
+
+# Propagation batching: wait up to this long (seconds) for more AT lines to
+# coalesce, and cap each write at this many bytes
+PROPAGATION_FLUSH_DELAY = 0.002
+PROPAGATION_BATCH_BYTES = 16384
 
 # Command validation
 MAX_RADIUS_KM = 50
@@ -37,14 +43,30 @@ MAX_INFO_LIMIT = 20
 
 # Message handling
 MAX_SEEN_MESSAGES = 1000
+MAX_CLIENTS = 10000
 
 # Logging configuration
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_LEVEL = 'INFO'
+LOG_MAX_BYTES = 10_000_000
+LOG_BACKUP_COUNT = 3
 
 # Google Places API settings
 PLACES_API_BASE_URL = "https://places.googleapis.com/v1/places:searchNearby"
 PLACES_API_HEADERS = {
     "Content-Type": "application/json",
     "X-Goog-FieldMask": "*"
-}
\ No newline at end of file
+}
+
+# Shared HTTP session for the Places API
+PLACES_API_TIMEOUT = 10
+PLACES_API_POOL_LIMIT = 32
+PLACES_API_POOL_LIMIT_PER_HOST = 8
+PLACES_API_DNS_CACHE_TTL = 300
+PLACES_API_KEEPALIVE_TIMEOUT = 75
+PLACES_API_MAX_CONCURRENT = PLACES_API_POOL_LIMIT_PER_HOST
+
+# Places API response cache
+PLACES_CACHE_TTL = 300
+PLACES_CACHE_MAX_ENTRIES = 512
+PLACES_CACHE_PRECISION = 4
\ No newline at end of file
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
+import atexit
 import logging
+import logging.handlers
 import os
-import time
-from config import LOG_FORMAT, LOG_LEVEL
+import queue
+from config import LOG_FORMAT, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT
 
-def setup_logger(name):
+_loggers = {}
+
+def setup_logger(name, rotate=False):
+    logger = _loggers.get(name)
+    if logger is not None:
+        return logger
+    
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
     
     logger = logging.getLogger(name)
     log_level = getattr(logging, LOG_LEVEL)
@@ -15,60 +22,98 @@ def setup_logger(name):
     
     if not logger.handlers:
         log_file = os.path.join(log_dir, f"{name}.log")
-        file_handler = logging.FileHandler(log_file)
+        # Rotation is only safe for a file one process writes; every server
+        # process appends to the shared API logs.
+        if rotate:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+        else:
+            file_handler = logging.FileHandler(log_file)
         file_formatter = logging.Formatter(LOG_FORMAT)
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
         
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(file_formatter)
-        logger.addHandler(console_handler)
-    
+        
+        # Handlers run on the listener thread so disk writes never block
+        # the event loop; the logger itself only enqueues records.
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.listener = listener
+    
+    _loggers[name] = logger
     return logger
 
+def stop_logger(logger):
+    # Tear the queue pipeline down so the next setup_logger() builds a fresh
+    # one; the atexit hook is dropped because QueueListener.stop() cannot be
+    # called twice.
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+            handler.close()
+    
+    listener = getattr(logger, 'listener', None)
+    if listener is not None:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger.listener = None
+    
+    _loggers.pop(logger.name, None)
+
 class ServerLogger:
     def __init__(self, server_id):
-        self.logger = setup_logger(server_id)
+        self.logger = setup_logger(server_id, rotate=True)
         self.server_id = server_id
     
     def startup(self):
-        self.logger.info(f"Server {self.server_id} starting up")
+        self.logger.info("Server %s starting up", self.server_id)
     
     def shutdown(self):
-        self.logger.info(f"Server {self.server_id} shutting down")
+        self.logger.info("Server %s shutting down", self.server_id)
+        stop_logger(self.logger)
     
     def client_connected(self, addr):
-        self.logger.info(f"New client connection from {addr}")
+        self.logger.info("New client connection from %s", addr)
     
     def client_disconnected(self, addr):
-        self.logger.info(f"Client disconnected: {addr}")
+        self.logger.info("Client disconnected: %s", addr)
     
     def server_connected(self, server_id):
-        self.logger.info(f"Connected to server {server_id}")
+        self.logger.info("Connected to server %s", server_id)
     
     def server_disconnected(self, server_id):
-        self.logger.info(f"Disconnected from server {server_id}")
+        self.logger.info("Disconnected from server %s", server_id)
     
-    def command_received(self, source, command):
-        self.logger.info(f"Received from {source}: {command}")
+    def command_received(self, addr, command):
+        self.logger.info("Received from client %s: %s", addr, command)
     
     def command_processed(self, command, response):
-        self.logger.info(f"Processed command {command} with response: {response}")
+        self.logger.info("Processed command %s with response: %s", command, response)
     
     def location_propagated(self, client_id, target_servers):
-        self.logger.info(f"Propagated location for {client_id} to servers: {', '.join(target_servers)}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Propagated location for %s to servers: %s",
+                             client_id, ', '.join(target_servers))
     
     def api_request(self, latitude, longitude, radius):
-        self.logger.info(f"Requesting places data for ({latitude}, {longitude}) with radius {radius}km")
+        self.logger.info("Requesting places data for (%s, %s) with radius %skm",
+                         latitude, longitude, radius)
     
-    def error(self, message, exc_info=False):
-        self.logger.error(message, exc_info=exc_info)
+    def error(self, message, *args, exc_info=False):
+        self.logger.error(message, *args, exc_info=exc_info)
     
-    def warning(self, message):
-        self.logger.warning(message)
+    def warning(self, message, *args):
+        self.logger.warning(message, *args)
     
-    def debug(self, message):
-        self.logger.debug(message)
+    def debug(self, message, *args):
+        self.logger.debug(message, *args)
     
-    def info(self, message):
-        self.logger.info(message)
\ No newline at end of file
+    def info(self, message, *args):
+        self.logger.info(message, *args)
\ No newline at end of file
@@ -2,79 +2,144 @@
 import asyncio
 import sys
 import time
-import json
+from collections import OrderedDict
 from config import (
     SERVER_IDS, SERVER_PORTS, SERVER_CONNECTIONS, HOST,
-    MAX_SEEN_MESSAGES
+    MAX_SEEN_MESSAGES, MAX_CLIENTS, STREAM_LIMIT,
+    PROPAGATION_FLUSH_DELAY, PROPAGATION_BATCH_BYTES
 )
 from utils import (
-    parse_at_message, validate_iamat_command, validate_whatsat_command,
-    parse_location, generate_message_id, has_seen_message
+    validate_iamat_command, validate_whatsat_command, validate_location_format,
+    parse_location, generate_message_id, has_seen_message, ClientInfo,
+    format_time_diff
 )
 from logger import ServerLogger
-from api import get_nearby_places
+from api import get_nearby_places, create_session
 
-client_locations = {}
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 class ProxyServer:
     def __init__(self, server_id):
         self.server_id = server_id
         self.port = SERVER_PORTS[server_id]
         self.logger = ServerLogger(server_id)
-        self.neighbors = SERVER_CONNECTIONS.get(server_id, [])
+        self.neighbors = tuple(SERVER_CONNECTIONS.get(server_id, []))
+        self.neighbor_addrs = {neighbor: (HOST, SERVER_PORTS[neighbor]) for neighbor in self.neighbors}
         self.server = None
-        self.seen_messages = set()
+        self.http_session = None
+        self.seen_messages = OrderedDict()
+        self.client_locations = OrderedDict()
+        self.neighbor_outboxes = {neighbor: asyncio.Queue() for neighbor in self.neighbors}
+        self.flusher_tasks = []
+        self.neighbor_connections = {}
+        self.client_connections = {}
+        self.command_handlers = {
+            "IAMAT": self.handle_iamat,
+            "WHATSAT": self.handle_whatsat,
+            "AT": self.handle_at_message
+        }
     
     async def start(self):
         self.logger.startup()
         
         self.server = await asyncio.start_server(
-            self.handle_client_connection, HOST, self.port)
+            self.handle_client_connection, HOST, self.port, limit=STREAM_LIMIT)
         
-        self.logger.info(f"Server {self.server_id} listening on {HOST}:{self.port}")
-        async with self.server:
-            await self.server.serve_forever()
+        self.logger.info("Server %s listening on %s:%s", self.server_id, HOST, self.port)
+        
+        self.http_session = create_session()
+        self.flusher_tasks = [
+            asyncio.create_task(self._neighbor_flusher(neighbor))
+            for neighbor in self.neighbors
+        ]
+        try:
+            async with self.server:
+                try:
+                    # Cancelling serve_forever() would wait in wait_closed() for
+                    # neighbors' AT connections, which never close (3.12+).
+                    await asyncio.get_running_loop().create_future()
+                finally:
+                    self.server.close()
+                    await self.close_client_connections()
+        finally:
+            for task in self.flusher_tasks:
+                task.cancel()
+            await asyncio.gather(*self.flusher_tasks, return_exceptions=True)
+            self.close_neighbor_connections()
+            await self.http_session.close()
+            self.http_session = None
+            self.logger.shutdown()
     
     async def handle_client_connection(self, reader, writer):
         addr = writer.get_extra_info('peername')
+        self.client_connections[asyncio.current_task()] = writer
         self.logger.client_connected(addr)
         
+        is_peer = False
         try:
-            data = await reader.readline()
-            if data:
-                message = data.decode().strip()
-                self.logger.command_received(f"client {addr}", message)
+            while True:
+                try:
+                    data = await reader.readline()
+                except ValueError:
+                    self.logger.warning("Rejecting line over %s bytes from %s", STREAM_LIMIT, addr)
+                    writer.write(b'? \n')
+                    return
+                
+                if not data:
+                    break
+                
+                message = data.strip().decode()
+                self.logger.command_received(addr, message)
                 
                 response = await self.process_command(message)
+                if response is None:
+                    is_peer = True
+                    continue
+                if is_peer:
+                    continue
                 
-                if response:
-                    writer.write(response.encode() + b'\n')
-                    await writer.drain()
-                    self.logger.command_processed(message, response)
+                writer.writelines((response.encode(), b'\n'))
+                self.logger.command_processed(message, response)
+                break
         except Exception as e:
-            self.logger.error(f"Error handling client: {e}", exc_info=True)
+            self.logger.error("Error handling client: %s", e, exc_info=True)
         finally:
+            self.client_connections.pop(asyncio.current_task(), None)
             writer.close()
             await writer.wait_closed()
             self.logger.client_disconnected(addr)
     
+    async def close_client_connections(self):
+        for writer in list(self.client_connections.values()):
+            writer.close()
+        await asyncio.gather(*self.client_connections, return_exceptions=True)
+    
     async def process_command(self, command):
         parts = command.split()
         
         if not parts:
             return "? "
         
-        cmd_type = parts[0]
-        
-        if cmd_type == "IAMAT":
-            return await self.handle_iamat(command, parts)
-        elif cmd_type == "WHATSAT":
-            return await self.handle_whatsat(command, parts)
-        elif cmd_type == "AT":
-            await self.handle_at_message(command)
-            return None
-        else:
+        handler = self.command_handlers.get(parts[0])
+        if handler is None:
             return f"? {command}"
+        
+        return await handler(command, parts)
+    
+    def store_client_location(self, client_id, client_info):
+        self.client_locations[client_id] = client_info
+        self.client_locations.move_to_end(client_id)
+        while len(self.client_locations) > MAX_CLIENTS:
+            self.client_locations.popitem(last=False)
+    
+    def get_client_location(self, client_id):
+        client_info = self.client_locations.get(client_id)
+        if client_info is not None:
+            self.client_locations.move_to_end(client_id)
+        return client_info
     
     async def handle_iamat(self, command, parts):
         if not validate_iamat_command(parts):
@@ -87,22 +152,22 @@ class ProxyServer:
             server_time = time.time()
             time_diff = server_time - client_time
             
-            time_diff_str = f"+{time_diff}" if time_diff >= 0 else f"{time_diff}"
-            
-            client_info = {
-                'client_id': client_id,
-                'location': location,
-                'timestamp': timestamp,
-                'server_id': self.server_id,
-                'time_diff': time_diff
-            }
-            client_locations[client_id] = client_info
+            time_diff_str = format_time_diff(time_diff)
             
             response = f"AT {self.server_id} {time_diff_str} {client_id} {location} {timestamp}"
             
-            client_locations[client_id]['msg'] = response
+            self.store_client_location(client_id, ClientInfo(
+                server_id=self.server_id,
+                client_id=client_id,
+                location=location,
+                timestamp=timestamp,
+                time_diff_str=time_diff_str,
+                msg=response
+            ))
             
-            await self.propagate_location(response)
+            self.propagate_location(
+                response, client_id,
+                generate_message_id(self.server_id, client_id, timestamp))
             
             return response
             
@@ -119,66 +184,112 @@ class ProxyServer:
             radius_km = int(radius_str)
             info_limit = int(limit_str)
             
-            if client_id not in client_locations:
+            client_info = self.get_client_location(client_id)
+            if client_info is None:
                 return f"? No information available for {client_id}"
             
-            client_info = client_locations[client_id]
-            
-            at_response = client_info.get('msg', None)
-            if not at_response:
-                time_diff = client_info['time_diff']
-                time_diff_str = f"+{time_diff}" if time_diff >= 0 else f"{time_diff}"
-                at_response = f"AT {client_info['server_id']} {time_diff_str} {client_info['client_id']} {client_info['location']} {client_info['timestamp']}"
+            at_response = client_info.msg
             
-            location_str = client_info['location']
+            location_str = client_info.location
             latitude, longitude = parse_location(location_str)
             
             self.logger.api_request(latitude, longitude, radius_km)
-            places_info = await get_nearby_places(latitude, longitude, radius_km, info_limit)
+            places_info = await get_nearby_places(
+                self.http_session, latitude, longitude, radius_km, info_limit)
             
             places_info = places_info.rstrip('\n')
             
             return f"{at_response}\n{places_info}\n\n"
             
         except ValueError as e:
-            self.logger.error(f"Error processing WHATSAT: {str(e)}")
+            self.logger.error("Error processing WHATSAT: %s", e)
             return f"? {command}"
     
-    async def propagate_location(self, at_message):
-        parts = at_message.split()
-        if len(parts) < 6:
-            self.logger.error(f"Invalid AT message format for propagation: {at_message}")
-            return
-            
-        client_id = parts[3]
-        timestamp = parts[5]
-        
-        message_id = generate_message_id(self.server_id, client_id, timestamp)
-        
+    def propagate_location(self, at_message, client_id, message_id, exclude=None):
         if has_seen_message(message_id, self.seen_messages, MAX_SEEN_MESSAGES):
-            self.logger.info(f"Already seen message for {client_id}, not propagating")
+            self.logger.info("Already seen message for %s, not propagating", client_id)
             return
         
-        self.seen_messages.add(message_id)
+        if exclude:
+            targets = tuple(n for n in self.neighbors if n not in exclude)
+        else:
+            targets = self.neighbors
+        if not targets:
+            return
         
-        for neighbor in self.neighbors:
+        item = (client_id, at_message.encode() + b'\n')
+        for neighbor in targets:
+            self.neighbor_outboxes[neighbor].put_nowait(item)
+    
+    async def _neighbor_flusher(self, neighbor):
+        outbox = self.neighbor_outboxes[neighbor]
+        while True:
+            client_id, payload = await outbox.get()
+            client_ids = [client_id]
+            batch = [payload]
+            batch_size = len(payload)
+            
+            await asyncio.sleep(PROPAGATION_FLUSH_DELAY)
+            while batch_size < PROPAGATION_BATCH_BYTES and not outbox.empty():
+                client_id, payload = outbox.get_nowait()
+                client_ids.append(client_id)
+                batch.append(payload)
+                batch_size += len(payload)
+            
+            if await self._send_to_neighbor(neighbor, b''.join(batch)):
+                for client_id in client_ids:
+                    self.logger.location_propagated(client_id, (neighbor,))
+    
+    async def _send_to_neighbor(self, neighbor, payload):
+        try:
+            writer, reused = await self._get_neighbor_writer(neighbor)
             try:
-                self.logger.info(f"Propagating to {neighbor}: {at_message}")
-                reader, writer = await asyncio.open_connection(HOST, SERVER_PORTS[neighbor])
-                
-                writer.write((at_message + '\n').encode())
+                writer.write(payload)
                 await writer.drain()
-                
-                writer.close()
-                await writer.wait_closed()
-            except Exception as e:
-                self.logger.warning(f"Failed to propagate to {neighbor}: {e}")
+                return True
+            except (ConnectionError, OSError):
+                self._drop_neighbor_connection(neighbor)
+                if not reused:
+                    raise
+            
+            writer, _ = await self._get_neighbor_writer(neighbor)
+            writer.write(payload)
+            await writer.drain()
+            return True
+        except Exception as e:
+            self._drop_neighbor_connection(neighbor)
+            self.logger.warning("Failed to propagate to %s: %s", neighbor, e)
+            return False
+    
+    async def _get_neighbor_writer(self, neighbor):
+        connection = self.neighbor_connections.get(neighbor)
+        if connection is not None:
+            reader, writer = connection
+            # The neighbor never writes back, so EOF means it closed on us
+            if not writer.is_closing() and not reader.at_eof():
+                return writer, True
+            self._drop_neighbor_connection(neighbor)
+        
+        host, port = self.neighbor_addrs[neighbor]
+        reader, writer = await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+        self.neighbor_connections[neighbor] = (reader, writer)
+        self.logger.server_connected(neighbor)
+        return writer, False
     
-    async def handle_at_message(self, at_message):
-        parts = at_message.split()
+    def _drop_neighbor_connection(self, neighbor):
+        connection = self.neighbor_connections.pop(neighbor, None)
+        if connection is not None:
+            connection[1].close()
+            self.logger.server_disconnected(neighbor)
+    
+    def close_neighbor_connections(self):
+        for neighbor in list(self.neighbor_connections):
+            self._drop_neighbor_connection(neighbor)
+    
+    async def handle_at_message(self, at_message, parts):
         if len(parts) < 6 or parts[0] != "AT":
-            self.logger.error(f"Invalid AT message format: {at_message}")
-            return
+            self.logger.error("Invalid AT message format: %s", at_message)
+            return f"? {at_message}"
         
         server_id = parts[1]
         time_diff_str = parts[2]
@@ -186,38 +297,39 @@ class ProxyServer:
         location = parts[4]
         timestamp = parts[5]
         
+        message_id = generate_message_id(server_id, client_id, timestamp)
+        if message_id in self.seen_messages:
+            self.logger.info("Already seen message for %s, ignoring", client_id)
+            return
+        
+        if not validate_location_format(location):
+            self.logger.error("Invalid location in AT message: %s", at_message)
+            return
+        
         try:
-            if time_diff_str.startswith('+'):
-                time_diff = float(time_diff_str[1:])
-            else:
-                time_diff = float(time_diff_str)
+            client_time = float(timestamp)
         except ValueError:
-            self.logger.error(f"Invalid time difference in AT message: {time_diff_str}")
+            self.logger.error("Invalid timestamp in AT message: %s", at_message)
             return
         
-        update_client = False
-        
-        if client_id not in client_locations:
-            update_client = True
-        elif float(timestamp) > float(client_locations[client_id].get('timestamp', 0)):
-            update_client = True
+        current = self.client_locations.get(client_id)
+        update_client = (current is None or
+                         client_time > float(current.timestamp))
             
         if update_client:
-            client_info = {
-                'server_id': server_id,
-                'client_id': client_id,
-                'location': location,
-                'timestamp': timestamp,
-                'time_diff': time_diff,
-                'msg': at_message
-            }
-            
-            self.logger.info(f"Updating location for {client_id} from {server_id}")
-            client_locations[client_id] = client_info
-            
-            await self.propagate_location(at_message)
+            self.logger.info("Updating location for %s from %s", client_id, server_id)
+            self.store_client_location(client_id, ClientInfo(
+                server_id=server_id,
+                client_id=client_id,
+                location=location,
+                timestamp=timestamp,
+                time_diff_str=time_diff_str,
+                msg=at_message
+            ))
+            
+            self.propagate_location(at_message, client_id, message_id, exclude={server_id})
         else:
-            self.logger.info(f"Ignoring older update for {client_id}")
+            self.logger.info("Ignoring older update for %s", client_id)
 
 async def main():
     if len(sys.argv) != 2:
@@ -243,4 +355,6 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main())
\ No newline at end of file
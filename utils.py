@@ -1,42 +1,24 @@
 #!/usr/bin/env python3
 import re
-import json
-import logging
-from datetime import datetime
+from dataclasses import dataclass
 from config import MAX_RADIUS_KM, MAX_INFO_LIMIT, MAX_SEEN_MESSAGES
 
-def parse_at_message(message):
-    parts = message.split()
-    
-    if len(parts) < 6 or parts[0] != "AT":
-        return None
-    
-    try:
-        server_id = parts[1]
-        time_diff_str = parts[2]
-        client_id = parts[3]
-        location = parts[4]
-        timestamp = parts[5]
-        
-        time_diff = parse_time_diff(time_diff_str)
-        
-        return {
-            'server_id': server_id,
-            'time_diff': time_diff,
-            'client_id': client_id,
-            'location': location,
-            'timestamp': timestamp
-        }
-    except (ValueError, IndexError):
-        return None
+_LOCATION_RE = re.compile(r'^([+-]\d+\.\d+)([+-]\d+\.\d+)$')
+
+@dataclass(slots=True)
+class ClientInfo:
+    server_id: str
+    client_id: str
+    location: str
+    timestamp: str
+    # Kept exactly as sent in the AT line; only the timestamp is compared
+    time_diff_str: str
+    msg: str
 
 def validate_iamat_command(parts):
     if len(parts) != 4:
         return False
     
-    if any(c.isspace() for c in parts[1]):
-        return False
-    
     if not validate_location_format(parts[2]):
         return False
     
@@ -47,16 +29,12 @@ def validate_iamat_command(parts):
         return False
 
 def validate_location_format(location_str):
-    location_pattern = r'^[+-]\d+\.\d+[+-]\d+\.\d+$'
-    return bool(re.match(location_pattern, location_str))
+    return _LOCATION_RE.match(location_str) is not None
     
 def validate_whatsat_command(parts):
     if len(parts) != 4:
         return False
     
-    if any(c.isspace() for c in parts[1]):
-        return False
-    
     try:
         radius = int(parts[2])
         limit = int(parts[3])
@@ -71,50 +49,26 @@ def validate_whatsat_command(parts):
 def format_time_diff(time_diff):
     return f"+{time_diff}" if time_diff >= 0 else f"{time_diff}"
 
-def parse_time_diff(time_diff_str):
-    if time_diff_str.startswith('+'):
-        return float(time_diff_str[1:])
-    else:
-        return float(time_diff_str)
-
-def format_flood_message(server_id, client_info):
-    time_diff = client_info['time_diff']
-    
-    if time_diff >= 0:
-        time_diff_str = f"+{time_diff}"
-    else:
-        time_diff_str = f"{time_diff}"
-    
-    return (f"AT {server_id} {time_diff_str} {client_info['client_id']} "
-            f"{client_info['location']} {client_info['timestamp']}")
-
 def has_seen_message(message_id, seen_messages, max_seen=MAX_SEEN_MESSAGES):
+    # seen_messages is an OrderedDict used as a bounded FIFO of message ids
     if message_id in seen_messages:
+        seen_messages.move_to_end(message_id)
         return True
     
-    seen_messages.add(message_id)
+    seen_messages[message_id] = None
     if len(seen_messages) > max_seen:
-        seen_messages.pop()
+        seen_messages.popitem(last=False)
     
     return False
 
 def generate_message_id(server_id, client_id, timestamp):
-    return f"{server_id}:{client_id}:{timestamp}"
+    # A tuple reuses the component strings' cached hashes instead of
+    # building and hashing a new joined string for every message.
+    return (server_id, client_id, timestamp)
 
 def parse_location(location_str):
-    if not validate_location_format(location_str):
+    match = _LOCATION_RE.match(location_str)
+    if not match:
         raise ValueError(f"Invalid location format: {location_str}")
-
-    lat_end = 0
-    for i in range(1, len(location_str)):
-        if location_str[i] in ('+', '-'):
-            lat_end = i
-            break
-    
-    if lat_end == 0:
-        raise ValueError(f"Cannot parse location: {location_str}")
-    
-    latitude = float(location_str[:lat_end])
-    longitude = float(location_str[lat_end:])
     
-    return latitude, longitude
\ No newline at end of file
+    return float(match.group(1)), float(match.group(2))
\ No newline at end of file